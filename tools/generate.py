@@ -1,11 +1,26 @@
 #!/usr/bin/env python3
 
+import os
 import resource
 import sqlite3
 import sys
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    # the n-gram counting kernel is compiled on the fly with Cython
+    import pyximport
+
+    pyximport.install(language_level=3)
+    from ngram_count import count_ngrams
+except ImportError:
+
+    def count_ngrams(text: str, n: int, counts: Counter) -> None:
+        """Increment in counts the hits of every n-gram of size n in text"""
+        counts.update([text[i : i + n] for i in range(len(text) - n + 1)])
+
+
 # some languages that don't use an alphabet are put apart as they are likely
 # to have a lot of different ngrams and by so need to have a lower limit for
 # the ngrams we kept for that languages
@@ -19,6 +34,10 @@ MIN_USER_CONTRIB_IN_LANG = 100
 # minimum and maximum sizes of the n-grams to be generated
 MIN_NGRAM_SIZE = 2
 MAX_NGRAM_SIZE = 5
+# minimum peak memory usage in megabytes allowed to each counting process
+# before its first buffer flush, below which buffers would hold too few
+# ngrams to merge their duplicates in memory
+MIN_PROCESS_MEMORY = 100
 
 
 class SqliteDB:
@@ -34,10 +53,16 @@ class SqliteDB:
         self._fp = db_path
 
     def delete_file(self) -> None:
-        """Delete the sqlite file of this database"""
+        """Delete the sqlite file of this database, along with the
+        journal files left by a connection that was not closed
+        """
         if self._fp.exists():
             print(f"Deleting {self._fp.name} database")
             self._fp.unlink()
+        for suffix in ("-wal", "-shm", "-journal"):
+            journal = self._fp.with_name(self._fp.name + suffix)
+            if journal.exists():
+                journal.unlink()
 
     @property
     def path(self) -> Path:
@@ -58,17 +83,52 @@ class RawTatodetectDB(SqliteDB):
         language they have contributed to
     """
 
+    def __init__(self, db_path: Path) -> None:
+        super().__init__(db_path)
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection used to bulk load the n-gram tables
+
+        The connection is opened on first use and reused until the
+        counting is over. As the raw database is only a staging file,
+        durability is traded for write speed.
+
+        The connection is in autocommit mode, transactions being
+        explicitly opened around each bulk write.
+        """
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._fp, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL;")
+            self._conn.execute("PRAGMA synchronous=OFF;")
+            self._conn.execute("PRAGMA temp_store=MEMORY;")
+            self._conn.execute("PRAGMA cache_size=-262144;")  # 256 MB
+            self._conn.execute("PRAGMA mmap_size=268435456;")  # 256 MB
+
+        return self._conn
+
+    def _close(self) -> None:
+        """Close the bulk load connection if it is open"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
     def count(
         self,
         sentences_detailed_path: Path,
-        sentence_blacklist: list,
+        sentence_blacklist: frozenset,
         max_memory: int = 500,
+        processes: int = None,
     ) -> None:
         """Count n-grams' occurrences for every Tatoeba language
 
         A contribution score equal to sum(len(sentences))
         is also computed for every language a user has contributed to.
 
+        The file is split into as many chunks as processes, each of them
+        counting its chunk into a database of its own. These databases
+        are then merged into this one.
+
         All results are gradually saved into database tables in
         order to mitigate the memory footprint of the process.
 
@@ -76,148 +136,309 @@ class RawTatodetectDB(SqliteDB):
         ----------
         sentences_detailed_path : Path
             path of the 'sentences_detailed.csv' weekly dump file
-        sentence_blacklist : list
-            the integer ids of the sentences that are not taken
-            into account for this counting
+        sentence_blacklist : frozenset
+            the ids of the sentences that are not taken into account
+            for this counting. They must be bytes, as read from the CSV
+            files by `get_sentences_with_tag`, since int or str ids never
+            match any sentence
         max_memory : int, optional
-            when the process crosses this peak memory usage in megabytes,
-            it triggers a buffer flushing, by default 500.
+            when the processes cross this peak memory usage in megabytes,
+            it triggers a buffer flushing, by default 500. It is shared
+            between the processes, each of them being allowed at least
+            MIN_PROCESS_MEMORY megabytes.
             Note that process speed mainly depends on the amount of data
             written to disk and consequently increases with the buffer size.
+        processes : int, optional
+            the number of processes counting the n-grams, by default the
+            number of usable CPUs, limited so that each process is allowed
+            MIN_PROCESS_MEMORY megabytes of max_memory
         """
         # the former database at this path is overwritten
         self.delete_file()
-        # initialize tables
-        self._init_db()
 
-        tot_ngrams = 0
-        peak_tot_ngrams = None  # number of ngrams at first buffer flush
+        if processes is None:
+            processes = min(
+                get_cpu_count(), max(1, max_memory // MIN_PROCESS_MEMORY)
+            )
+        chunks = get_file_chunks(sentences_detailed_path, processes)
+        chunk_dbs = [
+            RawTatodetectDB(
+                self._fp.with_name(f"{self._fp.stem}_{i}{self._fp.suffix}")
+            )
+            for i in range(len(chunks))
+        ]
+        # the memory limit is shared between the processes
+        max_chunk_memory = max(max_memory // len(chunks), MIN_PROCESS_MEMORY)
+        # the chunk databases are staging copies of the whole corpus, so
+        # they are deleted even when counting fails
+        try:
+            # unlike a pool, the executor fails as soon as a process dies,
+            # for instance when it is killed for lack of memory
+            with ProcessPoolExecutor(len(chunks)) as executor:
+                futures = [
+                    executor.submit(
+                        db._count_chunk,
+                        sentences_detailed_path,
+                        start,
+                        end,
+                        sentence_blacklist,
+                        max_chunk_memory,
+                    )
+                    for db, (start, end) in zip(chunk_dbs, chunks)
+                ]
+                chunk_scores = [future.result() for future in futures]
+
+            print(" done")
+
+            # tables are only initialized once the processes are over, as
+            # no sqlite connection may be open when they are forked
+            self._init_db()
+            # move the hit counts of every chunk into this database
+            self._merge_chunks(chunk_dbs)
+        finally:
+            for chunk_db in chunk_dbs:
+                chunk_db.delete_file()
+
+        # merge the partial hit counts of every buffer flush
+        self._sum_ngram_hits()
+
+        # save users contribution scores
         user_lang_score = defaultdict(int)
-        for n in range(MAX_NGRAM_SIZE, MIN_NGRAM_SIZE - 1, -1):
-            table_name = f"grams{n}"
-            lang_ngram_cnt = defaultdict(lambda: defaultdict(int))
-            with open(sentences_detailed_path, "r", encoding="utf-8") as f:
-                for line_id, line in enumerate(f):
-                    self._print_status(line_id, ngram_size=n)
-                    try:
-                        fields = line.rstrip().split("\t")
-                        sent_id, lang, text, user = fields[:4]
-                    except IndexError:
-                        print(f"Skipped erroneous line {line_id}: {line}")
-                        continue
-
-                    # sentences with an unset language are ignored
-                    if lang == "\\N" or lang == "":
-                        continue
-                    # sentences with an id matching the blacklist are ignored
-                    if int(sent_id) in sentence_blacklist:
-                        continue
-
-                    # compute user contribution score during last file reading
-                    if n == MIN_NGRAM_SIZE:
-                        user_lang_score[(user, lang)] += len(text)
+        for scores in chunk_scores:
+            for user_lang, score in scores.items():
+                user_lang_score[user_lang] += score
+        self._insert_user_scores(user_lang_score)
 
-                    # increment hit counts for each ngram in the sentence
-                    for i in range(len(text) - n + 1):
-                        ngram = text[i : i + n]
-                        if ngram not in lang_ngram_cnt[lang]:
-                            tot_ngrams += 1
-                        lang_ngram_cnt[lang][ngram] += 1
-
-                    # when buffer is full, save it into table and empty it
-                    if (
-                        peak_tot_ngrams is None
+        self._close()
+
+    def _count_chunk(
+        self,
+        sentences_detailed_path: Path,
+        start: int,
+        end: int,
+        sentence_blacklist: frozenset,
+        max_memory: int,
+    ) -> dict:
+        """Count n-grams' occurrences in the lines found between these
+        byte offsets of the sentences file
+
+        The partial hit counts are appended to the n-gram tables of this
+        database and the user contribution scores are returned. The ids
+        of sentence_blacklist must be bytes.
+        """
+        self.delete_file()
+        self._init_db()
+
+        ngram_sizes = range(MIN_NGRAM_SIZE, MAX_NGRAM_SIZE + 1)
+        # every n-gram size has its own buffer, flushed independently.
+        # Hits are kept in one counter per language rather than in a single
+        # dict keyed on (lang, ngram): the language counter is looked up once
+        # per sentence and the n-grams are stored without a key tuple, which
+        # takes about half the memory
+        lang_ngram_cnt = {n: defaultdict(Counter) for n in ngram_sizes}
+        # number of ngrams at first buffer flush
+        peak_tot_ngrams = {n: None for n in ngram_sizes}
+        user_lang_score = defaultdict(int)
+        # a single bytes object per language, so that the dictionary
+        # lookups done for each sentence compare keys by identity
+        langs = {}
+        # only the process of the first chunk reports its progress
+        verbose = start == 0
+        line_id = 0
+        pos = start
+        # the file is read as bytes and only the sentence text is decoded,
+        # the other fields being used as plain dictionary keys
+        with open(sentences_detailed_path, "rb", buffering=1 << 20) as f:
+            f.seek(start)
+            for line_id, line in enumerate(f):
+                if pos >= end:
+                    break
+                pos += len(line)
+                if verbose:
+                    self._print_status(line_id)
+
+                # when buffer is full, save it into table and empty it.
+                # The buffers are only checked every 1000 lines, as neither
+                # the memory usage nor the number of distinct ngrams need to
+                # be exact to drive the flushes. The check is done before
+                # any line gets skipped, so that it runs for every window of
+                # 1000 lines. It is not done on the first line, as an empty
+                # buffer must not set the flush threshold
+                if line_id != 0 and line_id % 1000 == 0:
+                    # the first flush is triggered by the memory usage of
+                    # the whole process, so every buffer is flushed at once
+                    memory_full = (
+                        peak_tot_ngrams[MIN_NGRAM_SIZE] is None
                         and get_peak_memory_usage() >= max_memory
-                    ) or (
-                        peak_tot_ngrams is not None
-                        and tot_ngrams >= peak_tot_ngrams
-                    ):
-                        self._upsert_ngram_hits(lang_ngram_cnt, table_name)
-                        lang_ngram_cnt.clear()
-                        peak_tot_ngrams = tot_ngrams
-                        tot_ngrams = 0
+                    )
+                    for n, buffer in lang_ngram_cnt.items():
+                        tot_ngrams = sum(map(len, buffer.values()))
+                        if memory_full or (
+                            peak_tot_ngrams[n] is not None
+                            and tot_ngrams >= peak_tot_ngrams[n]
+                        ):
+                            self._insert_ngram_hits(buffer, f"grams{n}")
+                            buffer.clear()
+                            peak_tot_ngrams[n] = tot_ngrams
+
+                # only the first 4 fields are needed, the rest of the line
+                # is left unsplit
+                fields = line.split(b"\t", 4)
+                if len(fields) < 4:
+                    line = line.decode("utf-8", errors="replace")
+                    print(f"Skipped erroneous line: {line}")
+                    continue
+                sent_id, lang, text, user = fields[:4]
+                # the user is the last field of truncated lines
+                user = user.rstrip(b"\r\n")
+
+                # sentences with an unset language are ignored
+                if lang == b"\\N" or lang == b"":
+                    continue
+                # sentences with an id matching the blacklist are ignored
+                if sent_id in sentence_blacklist:
+                    continue
+
+                lang = langs.setdefault(lang, lang)
+                text = text.decode("utf-8")
+                user_lang_score[(user, lang)] += len(text)
+
+                for n, buffer in lang_ngram_cnt.items():
+                    # increment hit counts for each ngram in the sentence
+                    count_ngrams(text, n, buffer[lang])
 
-            self._print_status(line_id, ngram_size=n, force=True)
+        if verbose:
+            self._print_status(line_id, force=True)
 
-            # move remaining ngram hits from memory to database tables
-            self._upsert_ngram_hits(lang_ngram_cnt, table_name)
+        # move remaining ngram hits from memory to database tables
+        for n in ngram_sizes:
+            self._insert_ngram_hits(lang_ngram_cnt[n], f"grams{n}")
 
-            print(" done")
+        self._close()
 
-        # save users contribution scores
-        self._insert_user_scores(user_lang_score)
+        return user_lang_score
 
     def _init_db(self) -> None:
         """Open the database connection and initialize the tables"""
 
-        with sqlite3.connect(self._fp) as conn:
-            # create a table for each n-gram type
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE;")
+        # create a table for each n-gram type
+        for n in range(MIN_NGRAM_SIZE, MAX_NGRAM_SIZE + 1):
+            self._create_ngram_table(conn, f"grams{n}")
+        # create a table dedicated to users contribution scores
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users_langs (
+              'user' text not null,
+              'lang' text not null,
+              'total' int not null default 0
+            );
+            """
+        )
+        conn.execute("COMMIT;")
+
+    @staticmethod
+    def _create_ngram_table(conn: sqlite3.Connection, table_name: str) -> None:
+        """Create a table of n-gram hit counts
+
+        No uniqueness constraint is set on (gram, lang) so that rows can
+        be appended without any B-tree lookup during the bulk load.
+        """
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+              'gram' text not null,
+              'lang'text not null,
+              'hit'  int not null
+            );
+            """
+        )
+
+    def _insert_ngram_hits(
+        self, lang_ngram_cnt: dict, table_name: str
+    ) -> None:
+        """Append partial n-gram hit counts to this table
+
+        The languages of the counts are given as UTF-8 encoded bytes.
+
+        The same (gram, lang) pair appears once per buffer flush and is
+        summed up afterwards by `_sum_ngram_hits`.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE;")
+        for lang, d in lang_ngram_cnt.items():
+            lang = lang.decode("utf-8")
+            conn.executemany(
+                f"INSERT INTO {table_name} VALUES (?, ?, ?);",
+                ((ngram, lang, hits) for ngram, hits in d.items()),
+            )
+        conn.execute("COMMIT;")
+
+    def _merge_chunks(self, chunk_dbs: list) -> None:
+        """Append the n-gram hit counts of these databases to the ones of
+        this database, then delete them
+        """
+        conn = self._connect()
+        for chunk_db in chunk_dbs:
+            conn.execute(
+                "ATTACH DATABASE ? AS chunk_db;", (str(chunk_db.path),)
+            )
+            conn.execute("BEGIN IMMEDIATE;")
             for n in range(MIN_NGRAM_SIZE, MAX_NGRAM_SIZE + 1):
                 conn.execute(
-                    f"""
-                    CREATE TABLE IF NOT EXISTS grams{n} (
-                      'gram' text not null,
-                      'lang'text not null,
-                      'hit'  int not null,
-                    UNIQUE("gram","lang")
-                    );
-                    """
+                    f"INSERT INTO grams{n} SELECT * FROM chunk_db.grams{n};"
                 )
-            # create a table dedicated to users contribution scores
+            conn.execute("COMMIT;")
+            conn.execute("DETACH DATABASE chunk_db;")
+            chunk_db.delete_file()
+
+    def _sum_ngram_hits(self) -> None:
+        """Merge the rows of every n-gram table sharing the same
+        (gram, lang) pair into a single row holding their total hits
+        """
+        conn = self._connect()
+        for n in range(MIN_NGRAM_SIZE, MAX_NGRAM_SIZE + 1):
+            print(f"Summing up hits of {n}-grams")
+            conn.execute("BEGIN IMMEDIATE;")
+            self._create_ngram_table(conn, f"grams{n}_sum")
             conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS users_langs (
-                  'user' text not null,
-                  'lang' text not null,
-                  'total' int not null default 0
-                );
+                f"""
+                INSERT INTO grams{n}_sum
+                  SELECT gram, lang, SUM(hit)
+                  FROM grams{n}
+                  GROUP BY gram, lang;
                 """
             )
-
-    def _upsert_ngram_hits(
-        self, lang_ngram_cnt: dict, table_name: str
-    ) -> None:
-        """Update n-gram hit count values in this table"""
-
-        with sqlite3.connect(self._fp) as conn:
-            conn.execute("PRAGMA temp_store=FILE;")
-            conn.execute("PRAGMA journal_mode=DELETE;")
-
-            for lang, d in lang_ngram_cnt.items():
-                for ngram, hits in d.items():
-                    conn.execute(
-                        f"""
-                        INSERT INTO {table_name}
-                          VALUES (:ngram, :lang, :hits) 
-                        ON CONFLICT (gram, lang) 
-                          DO UPDATE SET hit = hit + :hits;
-                        """,
-                        {"ngram": ngram, "lang": lang, "hits": hits},
-                    )
-            conn.execute("PRAGMA shrink_memory;")  # reduce memory load
+            conn.execute(f"DROP TABLE grams{n};")
+            conn.execute(f"ALTER TABLE grams{n}_sum RENAME TO grams{n};")
+            conn.execute("COMMIT;")
 
     def _insert_user_scores(self, user_lang_score: dict) -> None:
         """Insert user language contribution scores into table"""
 
         print("Inserting users contribution scores")
-        with sqlite3.connect(self._fp) as conn:
-            for (user, lang), hit in user_lang_score.items():
-                conn.execute(
-                    "INSERT INTO users_langs VALUES (?,?,?);",
-                    (user, lang, hit),
-                )
-            conn.execute("PRAGMA shrink_memory;")  # reduce memory load
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE;")
+        conn.executemany(
+            "INSERT INTO users_langs VALUES (?,?,?);",
+            (
+                (user.decode("utf-8"), lang.decode("utf-8"), hit)
+                for (user, lang), hit in user_lang_score.items()
+            ),
+        )
+        conn.execute("COMMIT;")
+        conn.execute("PRAGMA shrink_memory;")  # reduce memory load
 
     @staticmethod
-    def _print_status(
-        line_number: int, ngram_size: int, force: bool = False
-    ) -> None:
+    def _print_status(line_number: int, force: bool = False) -> None:
         """Keep track of n-gram counting progress"""
 
         if line_number % 10000 == 0 or force:
             msg = (
-                f"\rGenerating ngrams of size {ngram_size} "
-                f"(reading CSV file... {line_number} lines)"
+                f"\rGenerating ngrams of sizes {MIN_NGRAM_SIZE} to "
+                f"{MAX_NGRAM_SIZE} (reading first CSV file chunk... "
+                f"{line_number} lines)"
             )
             print(msg, end="")
             sys.stdout.flush()
@@ -259,6 +480,35 @@ class TatodetectDB(SqliteDB):
             # transfer n-grams counts table with extra frequencies
             langs_placeholder = ", ".join(["?"] * len(IDEOGRAM_LANGS))
 
+            # the n-gram totals of each language are computed only once,
+            # along with the minimum number of hits matching the frequency
+            # threshold of the language
+            c.execute(
+                f"""
+                CREATE TEMP TABLE lang_ngram_tots AS
+                SELECT
+                  lang,
+                  tot,
+                  CAST(tot * (
+                  CASE
+                    WHEN lang IN ({langs_placeholder})
+                    THEN ? ELSE ?
+                  END) AS INTEGER) AS min_hit
+                FROM (
+                SELECT
+                  lang,
+                  SUM(hit) AS tot
+                FROM raw_db.grams{n}
+                GROUP BY lang);
+                """,
+                (*IDEOGRAM_LANGS, IDEOGRAM_NGRAM_FREQ_LIMIT, NGRAM_FREQ_LIMIT),
+            )
+            c.execute(
+                "CREATE UNIQUE INDEX lang_ngram_tots_idx "
+                "ON lang_ngram_tots(lang);"
+            )
+            # the n-grams are filtered on their hits, so that the percent
+            # is only computed for the n-grams that are kept
             c.execute(
                 f"""
                 INSERT INTO main.grams{n}
@@ -268,22 +518,13 @@ class TatodetectDB(SqliteDB):
                   hit,
                   CAST(hit AS FLOAT) / lang_ngram_tots.tot AS percent
                 FROM raw_db.grams{n}
-                INNER JOIN (
-                SELECT
-                  lang, 
-                  SUM(hit) AS tot
-                FROM raw_db.grams{n}
-                GROUP BY lang) AS lang_ngram_tots
+                INNER JOIN lang_ngram_tots
                 ON raw_db.grams{n}.lang = lang_ngram_tots.lang
-                WHERE percent > (
-                CASE
-                  WHEN raw_db.grams{n}.lang IN ({langs_placeholder})
-                  THEN ? ELSE ?
-                END);
-                """,
-                (*IDEOGRAM_LANGS, IDEOGRAM_NGRAM_FREQ_LIMIT, NGRAM_FREQ_LIMIT),
+                WHERE hit > lang_ngram_tots.min_hit
+                ORDER BY gram, raw_db.grams{n}.lang;
+                """
             )
-            c.execute(f"CREATE INDEX gram_grams{n}_idx ON grams{n}(gram);")
+            c.execute("DROP TABLE lang_ngram_tots;")
 
         print(f"Importing key Tatoeba contributors from raw database")
         c.execute(
@@ -312,7 +553,9 @@ class TatodetectDB(SqliteDB):
         """Open tha database connection and initialize the tables"""
 
         with sqlite3.connect(self._fp) as conn:
-            # create a table for each n-gram type counts
+            # create a table for each n-gram type counts, whose rows are
+            # stored in the (gram, lang) primary key B-tree, which serves
+            # the n-gram lookups of the detection queries
             for n in range(MIN_NGRAM_SIZE, MAX_NGRAM_SIZE + 1):
                 conn.execute(
                     f"""
@@ -320,8 +563,9 @@ class TatodetectDB(SqliteDB):
                     'gram' text not null,
                     'lang'text not null,
                     'hit'  int not null,
-                    'percent' float not null default 0
-                    );
+                    'percent' float not null default 0,
+                    PRIMARY KEY ('gram', 'lang')
+                    ) WITHOUT ROWID;
                     """
                 )
             # create a table for storing the sentences counts of users
@@ -336,7 +580,7 @@ class TatodetectDB(SqliteDB):
             )
 
 
-def get_sentences_with_tag(tags_path: Path, tag_name: str) -> set:
+def get_sentences_with_tag(tags_path: Path, tag_name: str) -> frozenset:
     """Get the ids of the Tatoeba sentences with this tag
 
     Parameters
@@ -348,20 +592,58 @@ def get_sentences_with_tag(tags_path: Path, tag_name: str) -> set:
 
     Returns
     -------
-    set
-        the integer ids of the tagged sentences
+    frozenset
+        the ids of the tagged sentences, kept as the bytes read from the
+        file so that they can be matched without conversion
     """
     tagged = set()
+    tag_name = tag_name.encode("utf-8")
+    # lines are only split when they contain the tag
+    needle = b"\t" + tag_name
     try:
-        with open(tags_path, "r", encoding="utf-8") as f:
+        with open(tags_path, "rb") as f:
             for line in f:
-                sentence_id, tag = line.rstrip().split("\t")
+                if needle not in line:
+                    continue
+                sentence_id, tag = line.rstrip().split(b"\t")
                 if tag == tag_name:
-                    tagged.add(int(sentence_id))
+                    tagged.add(sentence_id)
     except IndexError:
         pass
 
-    return tagged
+    return frozenset(tagged)
+
+
+def get_file_chunks(file_path: Path, chunks: int) -> list:
+    """Split a file into chunks of about the same size which are made of
+    whole lines
+
+    Parameters
+    ----------
+    file_path : Path
+        the path of the file to split
+    chunks : int
+        the number of chunks to split the file into
+
+    Returns
+    -------
+    list
+        the (start, end) byte offsets of the chunks, fewer chunks than
+        requested being returned for a file with too few lines
+    """
+    size = file_path.stat().st_size
+    offsets = [0]
+    with open(file_path, "rb") as f:
+        for i in range(1, chunks):
+            # a chunk ends at the end of the line found at its theoretical end
+            f.seek(max(size * i // chunks, offsets[-1]))
+            f.readline()
+            if f.tell() >= size:
+                break
+            offsets.append(f.tell())
+    offsets.append(size)
+
+    return list(zip(offsets[:-1], offsets[1:]))
 
 
 def get_raw_db_path(db_path: Path) -> Path:
@@ -371,6 +653,14 @@ def get_raw_db_path(db_path: Path) -> Path:
     return db_path.parent.joinpath(f"{db_path.stem}_raw{db_path.suffix}")
 
 
+def get_cpu_count() -> int:
+    """Get the number of CPUs the current process is allowed to run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
 def get_peak_memory_usage() -> int:
     """Get peak memory usage of current process in megabytes"""
     if sys.platform in ("linux", "darwin"):
@@ -383,12 +673,15 @@ def get_peak_memory_usage() -> int:
 
 def main():
 
-    max_memory = 500  # peak memory usage of process in megabytes
+    max_memory = 500  # peak memory usage of all processes in megabytes
 
     # manage CLI inputs
     if len(sys.argv) < 3:
         fnames = "sentences_detailed.csv", "ngrams.db", "tags.csv"
-        msg = f"Usage: {sys.argv[0]} <{fnames[0]}> <{fnames[1]}> [{fnames[2]}]"
+        msg = (
+            f"Usage: {sys.argv[0]} <{fnames[0]}> <{fnames[1]}> "
+            f"[{fnames[2]}] [processes]"
+        )
         print(msg)
         sys.exit(1)
 
@@ -398,6 +691,10 @@ def main():
         tags_path = Path(sys.argv[3])
     except IndexError:
         tags_path = None
+    try:
+        processes = int(sys.argv[4])
+    except IndexError:
+        processes = None
 
     # the sentences tagged with '@change flag' are blacklisted because
     # they are very likely linked to wrong languages
@@ -406,7 +703,9 @@ def main():
     # same directory as the smaller final database actually used by Tatodetect
     raw_db_path = get_raw_db_path(tatodetect_db_path)
     raw_db = RawTatodetectDB(raw_db_path)
-    raw_db.count(sentences_detailed_path, sentence_blacklist, max_memory)
+    raw_db.count(
+        sentences_detailed_path, sentence_blacklist, max_memory, processes
+    )
     # copy most significant content from the raw database to the actual
     # Tatodetect database
     tatodetect_db = TatodetectDB(tatodetect_db_path)
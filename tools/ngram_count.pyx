@@ -0,0 +1,18 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""C implementation of the n-gram counting kernel used by generate.py
+
+It is compiled on the fly through pyximport when Cython is installed,
+generate.py falling back to a pure Python version otherwise.
+"""
+
+
+cpdef void count_ngrams(str text, Py_ssize_t n, object counts):
+    """Increment in counts the hits of every n-gram of size n in text"""
+    # counts is a Counter, whose items are handled like any dict ones
+    cdef dict d = <dict>counts
+    cdef Py_ssize_t i
+    cdef str ngram
+
+    for i in range(len(text) - n + 1):
+        ngram = text[i : i + n]
+        d[ngram] = d.get(ngram, 0) + 1